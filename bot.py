@@ -8,17 +8,15 @@ LLM: Remote (User's local machine via secure tunnel) with API fallback
 Run: python bot.py
 """
 
-import os
 import sys
 import time
 import signal
 import logging
 import asyncio
-import aiohttp
-import aiohttp.web
-from datetime import datetime
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass, field
+import functools
+import orjson
+from types import ModuleType
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple
 
 # Load .env file if python-dotenv is available
 try:
@@ -30,11 +28,20 @@ except ImportError:
 from telegram import Update
 from telegram.ext import (
     Application,
+    ApplicationHandlerStop,
+    BaseRateLimiter,
     CommandHandler,
     MessageHandler,
+    TypeHandler,
     ContextTypes,
     filters,
 )
+from telegram.request import HTTPXRequest
+
+from clawdbot._core import Config, LLMManager, BotState, send_typing, stream_response
+
+if TYPE_CHECKING:
+    import aiohttp.web
 
 # =============================================================================
 # LOGGING
@@ -47,257 +54,54 @@ logging.basicConfig(
 logger = logging.getLogger("clawdbot")
 
 # =============================================================================
-# CONFIGURATION
+# BOT STATE
 # =============================================================================
 
-
-@dataclass
-class Config:
-    """Bot configuration from environment variables."""
-
-    # Telegram
-    TELEGRAM_BOT_TOKEN: str = field(
-        default_factory=lambda: os.getenv("TELEGRAM_BOT_TOKEN", "")
-    )
-    TELEGRAM_ALLOWED_IDS: List[str] = field(
-        default_factory=lambda: [
-            x.strip()
-            for x in os.getenv("TELEGRAM_ALLOWED_IDS", "").split(",")
-            if x.strip()
-        ]
-    )
-
-    # Local LLM (Remote via tunnel)
-    LOCAL_LLM_API_BASE: str = field(
-        default_factory=lambda: os.getenv("LOCAL_LLM_API_BASE", "")
-    )
-    LOCAL_LLM_MODEL: str = field(
-        default_factory=lambda: os.getenv("LOCAL_LLM_MODEL", "")
-    )
-    LOCAL_LLM_TIMEOUT: int = field(
-        default_factory=lambda: int(os.getenv("LOCAL_LLM_TIMEOUT", "60"))
-    )
-
-    # Fallback APIs
-    OPENAI_API_KEY: Optional[str] = field(
-        default_factory=lambda: os.getenv("OPENAI_API_KEY")
-    )
-
-    # Web server port for health checks (Fly.io)
-    PORT: int = field(
-        default_factory=lambda: int(os.getenv("PORT", "8080"))
-    )
-
-    def validate(self) -> bool:
-        """Validate required configuration. Returns True if valid."""
-        ok = True
-        if not self.TELEGRAM_BOT_TOKEN:
-            logger.error("TELEGRAM_BOT_TOKEN is not set")
-            ok = False
-        if not self.TELEGRAM_ALLOWED_IDS:
-            logger.error("TELEGRAM_ALLOWED_IDS is not set")
-            ok = False
-        if not self.LOCAL_LLM_API_BASE:
-            logger.warning(
-                "LOCAL_LLM_API_BASE not set - only fallback APIs will be available"
-            )
-        return ok
-
+bot_state = BotState()
 
 # =============================================================================
-# LLM PROVIDER MANAGEMENT
+# OUTBOUND RATE LIMITING
 # =============================================================================
 
 
-@dataclass
-class LLMProvider:
-    """Single LLM provider."""
-
-    name: str
-    api_base: str
-    model: str
-    api_key: Optional[str] = None
-    timeout: int = 60
-    healthy: bool = True
-    last_error: Optional[str] = None
-    latency_ms: float = 0.0
-
-
-class LLMManager:
-    """Manages LLM providers with automatic fallback."""
-
-    def __init__(self, config: Config):
-        self.config = config
-        self.providers: List[LLMProvider] = []
-        self.current_provider_index = 0
-        self._setup_providers()
-
-    def _setup_providers(self):
-        # Priority 1: Local LLM via tunnel
-        if self.config.LOCAL_LLM_API_BASE:
-            self.providers.append(
-                LLMProvider(
-                    name="LOCAL",
-                    api_base=self.config.LOCAL_LLM_API_BASE,
-                    model=self.config.LOCAL_LLM_MODEL or "default",
-                    timeout=self.config.LOCAL_LLM_TIMEOUT,
-                )
-            )
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Token bucket applied to every Bot API call except getUpdates.
 
-        # Priority 2: OpenAI fallback
-        if self.config.OPENAI_API_KEY:
-            self.providers.append(
-                LLMProvider(
-                    name="OPENAI",
-                    api_base="https://api.openai.com/v1",
-                    model="gpt-4o-mini",
-                    api_key=self.config.OPENAI_API_KEY,
-                    timeout=30,
-                )
-            )
-
-        if not self.providers:
-            logger.error("No LLM providers configured! Bot will not be able to respond.")
-        else:
-            logger.info(f"Initialized {len(self.providers)} LLM provider(s): "
-                        f"{', '.join(p.name for p in self.providers)}")
-
-    @property
-    def current_provider(self) -> Optional[LLMProvider]:
-        if not self.providers:
-            return None
-        return self.providers[self.current_provider_index]
-
-    def switch_to_next_provider(self):
-        if len(self.providers) <= 1:
-            return
-        old = self.current_provider.name
-        self.current_provider_index = (self.current_provider_index + 1) % len(
-            self.providers
-        )
-        new = self.current_provider.name
-        logger.warning(f"Switched LLM provider: {old} -> {new}")
-
-    async def health_check(self, provider: Optional[LLMProvider] = None) -> bool:
-        prov = provider or self.current_provider
-        if prov is None:
-            return False
-
-        try:
-            start = time.time()
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": prov.model,
-                    "messages": [{"role": "user", "content": "Reply with OK."}],
-                    "max_tokens": 10,
-                    "temperature": 0.1,
-                }
-                headers = {"Content-Type": "application/json"}
-                if prov.api_key:
-                    headers["Authorization"] = f"Bearer {prov.api_key}"
-
-                async with session.post(
-                    f"{prov.api_base}/chat/completions",
-                    json=payload,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=prov.timeout),
-                ) as resp:
-                    prov.latency_ms = (time.time() - start) * 1000
-                    prov.healthy = resp.status == 200
-                    if not prov.healthy:
-                        prov.last_error = f"HTTP {resp.status}"
-                    return prov.healthy
-        except Exception as e:
-            prov.healthy = False
-            prov.last_error = str(e)
-            logger.warning(f"Health check failed for {prov.name}: {e}")
-            return False
-
-    async def generate(
-        self, messages: List[Dict[str, str]], max_tokens: int = 1024
-    ) -> Dict[str, Any]:
-        """Generate response with automatic fallback across providers."""
-        if not self.providers:
-            return {"success": False, "error": "No LLM providers configured", "provider": "NONE"}
-
-        attempts = 0
-        max_attempts = len(self.providers)
-
-        while attempts < max_attempts:
-            provider = self.current_provider
-
-            try:
-                start = time.time()
-                async with aiohttp.ClientSession() as session:
-                    payload = {
-                        "model": provider.model,
-                        "messages": messages,
-                        "max_tokens": max_tokens,
-                        "temperature": 0.7,
-                    }
-                    headers = {"Content-Type": "application/json"}
-                    if provider.api_key:
-                        headers["Authorization"] = f"Bearer {provider.api_key}"
-
-                    async with session.post(
-                        f"{provider.api_base}/chat/completions",
-                        json=payload,
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(total=provider.timeout),
-                    ) as resp:
-                        if resp.status == 200:
-                            provider.latency_ms = (time.time() - start) * 1000
-                            provider.healthy = True
-                            result = await resp.json()
-                            return {
-                                "success": True,
-                                "provider": provider.name,
-                                "model": provider.model,
-                                "content": result["choices"][0]["message"]["content"],
-                                "latency_ms": provider.latency_ms,
-                            }
-                        else:
-                            body = await resp.text()
-                            raise Exception(f"HTTP {resp.status}: {body[:200]}")
-
-            except Exception as e:
-                provider.healthy = False
-                provider.last_error = str(e)
-                logger.warning(f"Generation failed with {provider.name}: {e}")
-
-                if attempts < max_attempts - 1:
-                    self.switch_to_next_provider()
-
-                attempts += 1
-
-        return {
-            "success": False,
-            "error": "All providers failed",
-            "provider": "NONE",
-        }
-
-
-# =============================================================================
-# BOT STATE
-# =============================================================================
+    Installed on the Application, so command replies, edits, chat actions and
+    retries all draw from the same budget without per-call-site wrapping.
+    """
 
+    def __init__(self, rate: float = 25, burst: int = 30):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
 
-class BotState:
-    def __init__(self):
-        self.start_time = datetime.now()
-        self.message_count = 0
-        self.error_count = 0
-        self.llm_manager: Optional[LLMManager] = None
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last_refill) * self.rate
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
-    @property
-    def uptime(self) -> str:
-        delta = datetime.now() - self.start_time
-        hours, remainder = divmod(int(delta.total_seconds()), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{hours}h {minutes}m {seconds}s"
+    async def initialize(self):
+        pass
 
+    async def shutdown(self):
+        pass
 
-bot_state = BotState()
+    async def process_request(
+        self, callback, args, kwargs, endpoint, data, rate_limit_args
+    ):
+        await self.acquire()
+        return await callback(*args, **kwargs)
 
 # =============================================================================
 # TELEGRAM HANDLERS
@@ -305,15 +109,22 @@ bot_state = BotState()
 
 
 def is_authorized(user_id: int, config: Config) -> bool:
-    return str(user_id) in config.TELEGRAM_ALLOWED_IDS
+    return user_id in config.TELEGRAM_ALLOWED_IDS
 
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config: Config = context.bot_data["config"]
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("Unauthorized.")
+async def auth_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every other handler; drops updates from unknown users."""
+    user = update.effective_user
+    if user is not None and is_authorized(user.id, context.bot_data["config"]):
         return
+    # Only answer text (messages and commands); photos, stickers and group
+    # service messages are dropped silently so groups don't get spammed.
+    if update.message and update.message.text:
+        await update.message.reply_text("Unauthorized.")
+    raise ApplicationHandlerStop
 
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "ClawDBot - AI Assistant\n"
         "=======================\n"
@@ -326,11 +137,6 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config: Config = context.bot_data["config"]
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("Unauthorized.")
-        return
-
     llm_mgr = bot_state.llm_manager
     current = llm_mgr.current_provider if llm_mgr else None
 
@@ -342,55 +148,52 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Messages: {bot_state.message_count}\n"
         f"Errors: {bot_state.error_count}\n"
         f"Active LLM: {current.name if current else 'N/A'}\n"
-        f"Model: {current.model if current else 'N/A'}"
+        f"Model: {current.model if current else 'N/A'}\n"
+        f"Circuit: {current.cb_state() if current else 'N/A'}"
     )
 
     await update.message.reply_text(status_text)
 
 
 async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config: Config = context.bot_data["config"]
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("Unauthorized.")
-        return
-
     llm_mgr = bot_state.llm_manager
     if not llm_mgr or not llm_mgr.providers:
         await update.message.reply_text("No LLM providers configured.")
         return
 
-    await update.message.reply_text("Running health checks...")
+    placeholder = await update.message.reply_text("Running health checks...")
+
+    results = await asyncio.gather(
+        *(llm_mgr.health_check(p) for p in llm_mgr.providers),
+        return_exceptions=True,
+    )
 
     lines = ["LLM Health Report\n=================="]
-    for provider in llm_mgr.providers:
-        is_healthy = await llm_mgr.health_check(provider)
+    for provider, result in zip(llm_mgr.providers, results):
+        is_healthy = result is True
         status = "HEALTHY" if is_healthy else "UNHEALTHY"
         latency = f"{provider.latency_ms:.0f}ms" if provider.latency_ms > 0 else "N/A"
         lines.append(
             f"\n{provider.name}\n"
             f"  Status: {status}\n"
             f"  Model: {provider.model}\n"
-            f"  Latency: {latency}"
+            f"  Latency: {latency}\n"
+            f"  Circuit: {provider.cb_state()}"
         )
         if provider.last_error and not is_healthy:
             lines.append(f"  Error: {provider.last_error[:80]}")
 
-    await update.message.reply_text("\n".join(lines))
+    await placeholder.edit_text("\n".join(lines))
 
 
 async def model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config: Config = context.bot_data["config"]
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("Unauthorized.")
-        return
-
     llm_mgr = bot_state.llm_manager
     if not llm_mgr or not llm_mgr.current_provider:
         await update.message.reply_text("No LLM providers configured.")
         return
 
     current = llm_mgr.current_provider
-    fallbacks = [p.name for p in llm_mgr.providers if p.name != current.name]
+    fallbacks = ", ".join(llm_mgr.fallbacks_of(current.name)) or "None"
 
     model_info = (
         "Active Model\n"
@@ -400,23 +203,28 @@ async def model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"Endpoint: {current.api_base[:50]}...\n"
         f"Latency: {current.latency_ms:.0f}ms\n"
         f"Health: {'OK' if current.healthy else 'DOWN'}\n"
-        f"Fallbacks: {', '.join(fallbacks) if fallbacks else 'None'}"
+        f"Fallbacks: {fallbacks}"
     )
 
     await update.message.reply_text(model_info)
 
 
+def _looks_like_bad_markdown(s: str) -> bool:
+    """Cheap check for unbalanced Markdown (V1) entities Telegram would reject."""
+    return bool(
+        s.count("`") % 2
+        or s.count("*") % 2
+        or ("_" in s and s.count("_") % 2)
+    )
+
+
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config: Config = context.bot_data["config"]
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("Unauthorized.")
+    # Edited messages arrive with update.message unset
+    if update.message is None or not update.message.text:
         return
-
     user_message = update.message.text
-    if not user_message:
-        return
 
-    bot_state.message_count += 1
+    bot_state.record_message()
 
     llm_mgr = bot_state.llm_manager
     if not llm_mgr or not llm_mgr.providers:
@@ -425,30 +233,44 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Show typing indicator
-    try:
-        await context.bot.send_chat_action(
-            chat_id=update.effective_chat.id, action="typing"
-        )
-    except Exception:
-        pass
-
-    # Generate response
+    # Answer cache hits with a single reply. Otherwise stream into a
+    # placeholder message, editing it as chunks arrive; if streaming fails,
+    # fall back to a regular request with provider fallback.
     messages = [{"role": "user", "content": user_message}]
-    result = await llm_mgr.generate(messages)
+    result = llm_mgr.cached_response(messages)
+    send = update.message.reply_text
+    if result is None:
+        # Show typing indicator without holding up generation
+        context.application.create_task(
+            send_typing(context.bot, update.effective_chat.id), update=update
+        )
+        placeholder = await update.message.reply_text("…")
+        send = placeholder.edit_text
+        result = await stream_response(llm_mgr, messages, placeholder.edit_text)
 
     if result["success"]:
-        response = result["content"]
-        if result["provider"] != "LOCAL":
-            response += f"\n\n(via {result['provider']})"
-        # Try Markdown first, fall back to plain text
-        try:
-            await update.message.reply_text(response, parse_mode="Markdown")
-        except Exception:
-            await update.message.reply_text(response)
+        response = (
+            result["content"]
+            if result["provider"] == "LOCAL"
+            else f"{result['content']}\n\n(via {result['provider']})"
+        )
+        # Try Markdown first, fall back to plain text. Skip the Markdown
+        # attempt when the entities are obviously unbalanced, and the plain
+        # edit when streaming already left exactly this text in place
+        # (Telegram rejects it as "message is not modified").
+        already_shown = response == result.get("shown")
+        if _looks_like_bad_markdown(response):
+            if not already_shown:
+                await send(response)
+        else:
+            try:
+                await send(response, parse_mode="Markdown")
+            except Exception:
+                if not already_shown:
+                    await send(response)
     else:
-        bot_state.error_count += 1
-        await update.message.reply_text(
+        bot_state.record_error()
+        await send(
             "Failed to generate response. All LLM providers unavailable.\n"
             "Use /health to check provider status."
         )
@@ -459,8 +281,30 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =============================================================================
 
 
-async def web_health_handler(request: aiohttp.web.Request) -> aiohttp.web.Response:
-    """HTTP health endpoint for Fly.io and monitoring."""
+# Last healthy /health payload, reused for a few seconds to absorb probe bursts.
+# Unhealthy results are never cached so recovery shows up immediately.
+_web_health_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+_WEB_HEALTH_TTL = 5
+
+
+def _dumps(obj: Any) -> str:
+    return orjson.dumps(obj).decode()
+
+
+async def web_health_handler(
+    request: "aiohttp.web.Request", web: ModuleType
+) -> "aiohttp.web.Response":
+    """HTTP health endpoint for Fly.io and monitoring.
+
+    `web` is the aiohttp.web module, bound by run() so the hot path doesn't
+    repeat the import.
+    """
+    global _web_health_cache
+    if _web_health_cache is not None:
+        cached_at, cached = _web_health_cache
+        if time.time() - cached_at < _WEB_HEALTH_TTL and cached["llm_healthy"]:
+            return web.json_response(cached, dumps=_dumps)
+
     llm_mgr = bot_state.llm_manager
     current = llm_mgr.current_provider if llm_mgr else None
 
@@ -473,11 +317,15 @@ async def web_health_handler(request: aiohttp.web.Request) -> aiohttp.web.Respon
         "llm_model": current.model if current else "none",
         "llm_healthy": current.healthy if current else False,
     }
-    return aiohttp.web.json_response(data)
+    if data["llm_healthy"] is True:
+        _web_health_cache = (time.time(), data)
+    return web.json_response(data, dumps=_dumps)
 
 
-async def web_root_handler(request: aiohttp.web.Request) -> aiohttp.web.Response:
-    return aiohttp.web.Response(
+async def web_root_handler(
+    request: "aiohttp.web.Request", web: ModuleType
+) -> "aiohttp.web.Response":
+    return web.Response(
         text="ClawDBot is running. GET /health for status.",
         content_type="text/plain",
     )
@@ -498,53 +346,103 @@ async def run():
     logger.info("=" * 50)
     logger.info("ClawDBot starting up")
     logger.info("=" * 50)
-    logger.info(f"Allowed Telegram users: {config.TELEGRAM_ALLOWED_IDS}")
+    logger.info("Allowed Telegram users: %s", config.TELEGRAM_ALLOWED_IDS)
     if config.LOCAL_LLM_API_BASE:
-        logger.info(f"Local LLM endpoint: {config.LOCAL_LLM_API_BASE}")
-        logger.info(f"Local LLM model: {config.LOCAL_LLM_MODEL}")
+        logger.info("Local LLM endpoint: %s", config.LOCAL_LLM_API_BASE)
+        logger.info("Local LLM model: %s", config.LOCAL_LLM_MODEL)
     if config.OPENAI_API_KEY:
         logger.info("OpenAI fallback: configured")
 
     # --- Initialize LLM manager ---
     bot_state.llm_manager = LLMManager(config)
+    await bot_state.llm_manager.startup()
 
-    # Initial health check
+    # Initial health check runs in the background so startup isn't gated on
+    # an LLM round trip; the first real request will fall back if needed.
+    initial_probe = None
     if bot_state.llm_manager.providers:
-        logger.info("Running initial LLM health check...")
-        healthy = await bot_state.llm_manager.health_check()
-        if healthy:
-            logger.info(
-                f"Primary LLM healthy: {bot_state.llm_manager.current_provider.name} "
-                f"({bot_state.llm_manager.current_provider.latency_ms:.0f}ms)"
-            )
-        else:
-            logger.warning("Primary LLM unhealthy — will try fallbacks on first message")
-            if len(bot_state.llm_manager.providers) > 1:
-                bot_state.llm_manager.switch_to_next_provider()
+        llm_mgr = bot_state.llm_manager
+        primary = llm_mgr.current_provider
+
+        def _on_initial_probe(task: asyncio.Task):
+            if task.cancelled():
+                return
+            if task.exception() is None and task.result():
+                logger.info(
+                    "Primary LLM healthy: %s (%.0fms)", primary.name, primary.latency_ms
+                )
+                return
+            logger.warning("Primary LLM unhealthy — switching to fallback")
+            llm_mgr.switch_away_from(primary)
+
+        logger.info("Running initial LLM health check in background...")
+        initial_probe = asyncio.create_task(llm_mgr.health_check(primary))
+        initial_probe.add_done_callback(_on_initial_probe)
+
+    # Periodic re-probing keeps the active provider healthy between requests
+    probe_task = None
+    if config.LLM_PROBE_INTERVAL > 0 and bot_state.llm_manager.providers:
+        probe_task = asyncio.create_task(
+            bot_state.llm_manager.periodic_probe(config.LLM_PROBE_INTERVAL)
+        )
 
     # --- Build Telegram application ---
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    # Dedicated connection pools for outgoing API calls and long polling so a
+    # burst of replies cannot starve getUpdates (and vice versa).
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .request(
+            HTTPXRequest(
+                connection_pool_size=64,
+                pool_timeout=10.0,
+                connect_timeout=5.0,
+                read_timeout=20.0,
+            )
+        )
+        .get_updates_request(
+            HTTPXRequest(
+                connection_pool_size=8,
+                pool_timeout=30.0,
+                read_timeout=35.0,
+            )
+        )
+        .concurrent_updates(True)
+        # Telegram allows ~30 outgoing messages/sec per bot; leave headroom
+        .rate_limiter(TokenBucketRateLimiter(rate=25, burst=30))
+        .build()
+    )
     application.bot_data["config"] = config
 
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", start_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("health", health_command))
-    application.add_handler(CommandHandler("model", model_command))
+    # Authorization runs first (group -1) and stops unauthorized updates
+    application.add_handler(TypeHandler(Update, auth_gate), group=-1)
+    # block=False: a slow LLM call in one chat must not hold up the others
+    application.add_handler(CommandHandler("start", start_command, block=False))
+    application.add_handler(CommandHandler("help", start_command, block=False))
+    application.add_handler(CommandHandler("status", status_command, block=False))
+    application.add_handler(CommandHandler("health", health_command, block=False))
+    application.add_handler(CommandHandler("model", model_command, block=False))
     application.add_handler(
-        MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler)
+        MessageHandler(
+            filters.TEXT & ~filters.COMMAND, message_handler, block=False
+        )
     )
 
     # --- Start health-check web server ---
+    # Imported here so importing this module doesn't pull in the server stack.
+    import aiohttp.web
+
     web_app = aiohttp.web.Application()
-    web_app.router.add_get("/", web_root_handler)
-    web_app.router.add_get("/health", web_health_handler)
+    web_app.router.add_get("/", functools.partial(web_root_handler, web=aiohttp.web))
+    web_app.router.add_get(
+        "/health", functools.partial(web_health_handler, web=aiohttp.web)
+    )
 
     runner = aiohttp.web.AppRunner(web_app)
     await runner.setup()
     site = aiohttp.web.TCPSite(runner, "0.0.0.0", config.PORT)
     await site.start()
-    logger.info(f"Health-check web server listening on port {config.PORT}")
+    logger.info("Health-check web server listening on port %s", config.PORT)
 
     # --- Start Telegram polling ---
     await application.initialize()
@@ -577,9 +475,13 @@ async def run():
 
     # --- Graceful shutdown ---
     logger.info("Shutting down...")
+    for task in (initial_probe, probe_task):
+        if task is not None and not task.done():
+            task.cancel()
     await application.updater.stop()
     await application.stop()
     await application.shutdown()
+    await bot_state.llm_manager.close()
     await runner.cleanup()
     logger.info("ClawDBot stopped.")
 
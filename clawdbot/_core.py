@@ -0,0 +1,784 @@
+"""
+ClawDBot core - configuration, LLM provider management and runtime state
+========================================================================
+Shared by the Fly.io entry point (bot.py) and the VPS bundle (clawdbot/bot.py).
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import itertools
+import aiohttp
+import orjson
+from collections import OrderedDict
+from contextlib import aclosing
+from hashlib import sha256
+from typing import (
+    Optional, Dict, Any, List, Tuple, FrozenSet, AsyncIterator, Awaitable, Callable
+)
+from dataclasses import dataclass, field
+from enum import Enum
+from urllib.parse import urlparse
+
+logger = logging.getLogger("clawdbot")
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+
+class TunnelType(Enum):
+    """How LOCAL_LLM_API_BASE reaches the user's machine."""
+
+    CLOUDFLARE = "cloudflare"
+    NGROK = "ngrok"
+    LOCALTUNNEL = "localtunnel"
+    DIRECT = "direct"
+    UNKNOWN = "unknown"
+
+
+def detect_tunnel_type(url: str) -> TunnelType:
+    host = urlparse(url).hostname or ""
+    if not host:
+        return TunnelType.UNKNOWN
+    if host.endswith("trycloudflare.com"):
+        return TunnelType.CLOUDFLARE
+    if "ngrok" in host:
+        return TunnelType.NGROK
+    if host.endswith("loca.lt"):
+        return TunnelType.LOCALTUNNEL
+    return TunnelType.DIRECT
+
+
+@dataclass
+class Config:
+    """Bot configuration from environment variables."""
+
+    # Telegram
+    TELEGRAM_BOT_TOKEN: str = field(
+        default_factory=lambda: os.getenv("TELEGRAM_BOT_TOKEN", "")
+    )
+    TELEGRAM_ALLOWED_IDS: FrozenSet[int] = field(
+        default_factory=lambda: frozenset(
+            int(x)
+            for x in os.getenv("TELEGRAM_ALLOWED_IDS", "").split(",")
+            if x.strip().isdigit()
+        )
+    )
+
+    # Local LLM (Remote via tunnel)
+    LOCAL_LLM_API_BASE: str = field(
+        default_factory=lambda: os.getenv("LOCAL_LLM_API_BASE", "")
+    )
+    LOCAL_LLM_MODEL: str = field(
+        default_factory=lambda: os.getenv("LOCAL_LLM_MODEL", "")
+    )
+    LOCAL_LLM_TIMEOUT: int = field(
+        default_factory=lambda: int(os.getenv("LOCAL_LLM_TIMEOUT", "60"))
+    )
+    # Max LLM requests in flight at once (protects the local GPU and
+    # hosted-provider rate limits)
+    MAX_CONCURRENT_LLM: int = field(
+        default_factory=lambda: int(os.getenv("MAX_CONCURRENT_LLM", "4"))
+    )
+    # Seconds between background probes of providers ranked above the
+    # active one (0 disables); each probe is a billed completion
+    LLM_PROBE_INTERVAL: int = field(
+        default_factory=lambda: int(os.getenv("LLM_PROBE_INTERVAL", "300"))
+    )
+
+    # Fallback APIs
+    OPENAI_API_KEY: Optional[str] = field(
+        default_factory=lambda: os.getenv("OPENAI_API_KEY")
+    )
+    ANTHROPIC_API_KEY: Optional[str] = field(
+        default_factory=lambda: os.getenv("ANTHROPIC_API_KEY")
+    )
+
+    # Web server port for health checks (Fly.io)
+    PORT: int = field(
+        default_factory=lambda: int(os.getenv("PORT", "8080"))
+    )
+
+    def __post_init__(self):
+        self.tunnel_type = detect_tunnel_type(self.LOCAL_LLM_API_BASE)
+
+    def validate(self) -> bool:
+        """Validate required configuration. Returns True if valid."""
+        ok = True
+        if not self.TELEGRAM_BOT_TOKEN:
+            logger.error("TELEGRAM_BOT_TOKEN is not set")
+            ok = False
+        if not self.TELEGRAM_ALLOWED_IDS:
+            logger.error("TELEGRAM_ALLOWED_IDS is not set or has no numeric IDs")
+            ok = False
+        if not self.LOCAL_LLM_API_BASE:
+            logger.warning(
+                "LOCAL_LLM_API_BASE not set - only fallback APIs will be available"
+            )
+        return ok
+
+
+# =============================================================================
+# LLM PROVIDER MANAGEMENT
+# =============================================================================
+
+# HTTP statuses worth retrying against the same provider before falling back.
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+@dataclass
+class LLMProvider:
+    """Single LLM provider."""
+
+    name: str
+    api_base: str
+    model: str
+    api_key: Optional[str] = None
+    timeout: int = 60
+    healthy: bool = True
+    last_error: Optional[str] = None
+    latency_ms: float = 0.0
+
+    # Circuit breaker: after cb_threshold consecutive failures the provider
+    # is skipped for cb_open_secs, then a single probe request is let through.
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    cb_threshold: int = 5
+    cb_open_secs: int = 60
+    cb_probing: bool = False
+
+    # Error-log throttling (see _log_provider_error).
+    last_log_ts: float = 0.0
+    suppressed_logs: int = 0
+
+    # Request headers, built once per provider.
+    _headers: Dict[str, str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            self._headers["Authorization"] = f"Bearer {self.api_key}"
+
+    def cb_state(self) -> str:
+        if self.consecutive_failures < self.cb_threshold:
+            return "CLOSED"
+        if time.time() - self.opened_at < self.cb_open_secs:
+            return "OPEN"
+        return "HALF_OPEN"
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.cb_probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.cb_probing = False
+        if self.consecutive_failures >= self.cb_threshold:
+            self.opened_at = time.time()
+
+
+def _log_provider_error(provider: LLMProvider, message: str, period: float = 10.0):
+    """Log a provider failure at most once per `period` seconds.
+
+    Failures inside the window are only counted; the count is appended to the
+    next message that does get logged.
+    """
+    now = time.time()
+    if now - provider.last_log_ts < period:
+        provider.suppressed_logs += 1
+        return
+    if provider.suppressed_logs:
+        message += f" ({provider.suppressed_logs} similar errors suppressed)"
+        provider.suppressed_logs = 0
+    provider.last_log_ts = now
+    logger.warning(message)
+
+
+def _parse_sse_frame(frame: bytes) -> Optional[str]:
+    """Return the content delta carried by one chat-completions SSE frame."""
+    for line in frame.splitlines():
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == b"[DONE]":
+            continue
+        choices = orjson.loads(data).get("choices") or []
+        if choices:
+            return (choices[0].get("delta") or {}).get("content")
+    return None
+
+
+class LLMManager:
+    """Manages LLM providers with automatic fallback."""
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.providers: List[LLMProvider] = []
+        self.current_provider_index = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        # LRU of successful responses: key -> (stored_at, result)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_max = 512
+        self._cache_ttl = 3600
+        self._sem = asyncio.Semaphore(self.config.MAX_CONCURRENT_LLM or 4)
+        self._setup_providers()
+
+    def _setup_providers(self):
+        # Priority 1: Local LLM via tunnel
+        if self.config.LOCAL_LLM_API_BASE:
+            self.providers.append(
+                LLMProvider(
+                    name="LOCAL",
+                    api_base=self.config.LOCAL_LLM_API_BASE,
+                    model=self.config.LOCAL_LLM_MODEL or "default",
+                    timeout=self.config.LOCAL_LLM_TIMEOUT,
+                )
+            )
+
+        # Priority 2: OpenAI fallback
+        if self.config.OPENAI_API_KEY:
+            self.providers.append(
+                LLMProvider(
+                    name="OPENAI",
+                    api_base="https://api.openai.com/v1",
+                    model="gpt-4o-mini",
+                    api_key=self.config.OPENAI_API_KEY,
+                    timeout=30,
+                )
+            )
+
+        # The provider set is fixed after setup, so fallbacks are precomputed.
+        self._name_to_provider = {p.name: p for p in self.providers}
+        self._fallbacks = {
+            name: tuple(n for n in self._name_to_provider if n != name)
+            for name in self._name_to_provider
+        }
+
+        if not self.providers:
+            logger.error("No LLM providers configured! Bot will not be able to respond.")
+        else:
+            logger.info(
+                "Initialized %d LLM provider(s): %s",
+                len(self.providers),
+                ", ".join(self._name_to_provider),
+            )
+
+    def fallbacks_of(self, current_name: str) -> Tuple[str, ...]:
+        """Names of all providers other than `current_name`, in priority order."""
+        return self._fallbacks.get(current_name, ())
+
+    async def startup(self):
+        """Open the shared HTTP session used for all provider requests."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=20,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=60),
+            )
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def current_provider(self) -> Optional[LLMProvider]:
+        if not self.providers:
+            return None
+        return self.providers[self.current_provider_index]
+
+    def switch_to_next_provider(self):
+        if len(self.providers) <= 1:
+            return
+        old = self.current_provider.name
+        self.current_provider_index = (self.current_provider_index + 1) % len(
+            self.providers
+        )
+        new = self.current_provider.name
+        logger.warning(f"Switched LLM provider: {old} -> {new}")
+
+    def _switch_to(self, provider: LLMProvider):
+        if provider is self.current_provider:
+            return
+        old = self.current_provider.name
+        self.current_provider_index = self.providers.index(provider)
+        logger.warning(f"Switched LLM provider: {old} -> {provider.name}")
+
+    def switch_away_from(self, provider: LLMProvider):
+        """Advance past `provider` if it is still the current one.
+
+        Concurrent requests that fail on the same provider would otherwise
+        each advance the index and could land back on the failed provider.
+        """
+        if self.current_provider is provider:
+            self.switch_to_next_provider()
+
+    async def probe_all(
+        self, providers: Optional[List[LLMProvider]] = None
+    ) -> List[bool]:
+        """Health-check providers concurrently and select the first healthy one.
+
+        Checks all providers unless `providers` is given. Returns per-provider
+        health in priority order. Providers whose circuit breaker isn't closed
+        are never selected, and the current provider is left unchanged when
+        none qualify.
+        """
+        if providers is None:
+            providers = self.providers
+        results = await asyncio.gather(
+            *(self.health_check(p) for p in providers),
+            return_exceptions=True,
+        )
+        healthy = [r is True for r in results]
+        for provider, ok in zip(providers, healthy):
+            if ok and provider.cb_state() == "CLOSED":
+                self._switch_to(provider)
+                break
+        return healthy
+
+    async def periodic_probe(self, interval: float):
+        """Probe providers ranked above the current one every `interval` seconds.
+
+        Lets the bot fail back to LOCAL once it recovers. The current provider
+        is exercised by real traffic and isn't probed, so nothing is sent
+        while the top provider is active. Runs until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            preferred = self.providers[: self.current_provider_index]
+            if preferred:
+                await self.probe_all(preferred)
+
+    async def health_check(self, provider: Optional[LLMProvider] = None) -> bool:
+        prov = provider or self.current_provider
+        if prov is None:
+            return False
+
+        try:
+            await self.startup()
+            start = time.time()
+            payload = {
+                "model": prov.model,
+                "messages": [{"role": "user", "content": "Reply with OK."}],
+                "max_tokens": 10,
+                "temperature": 0.1,
+            }
+            async with self._session.post(
+                f"{prov.api_base}/chat/completions",
+                data=orjson.dumps(payload),
+                headers=prov._headers,
+                timeout=aiohttp.ClientTimeout(total=prov.timeout),
+            ) as resp:
+                prov.latency_ms = (time.time() - start) * 1000
+                prov.healthy = resp.status == 200
+                if prov.healthy:
+                    # A tiny probe passing doesn't prove real requests work; an
+                    # open breaker has to recover through its HALF_OPEN request.
+                    if prov.cb_state() == "CLOSED":
+                        prov.record_success()
+                else:
+                    prov.last_error = f"HTTP {resp.status}"
+                    prov.record_failure()
+                return prov.healthy
+        except Exception as e:
+            prov.healthy = False
+            prov.last_error = str(e)
+            prov.record_failure()
+            _log_provider_error(prov, f"Health check failed for {prov.name}: {e}")
+            return False
+
+    @staticmethod
+    def _cache_key(
+        messages: List[Dict[str, str]], max_tokens: int, model: str
+    ) -> str:
+        # Exact match on the conversation (surrounding whitespace ignored; case
+        # matters for code and identifiers) and on the model that answers it,
+        # so a fallback provider's reply isn't replayed once LOCAL is back.
+        normalized = [{**m, "content": m.get("content", "").strip()} for m in messages]
+        raw = orjson.dumps(
+            {"msgs": normalized, "mt": max_tokens, "model": model},
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return sha256(raw).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.time() - stored_at >= self._cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return {**result, "provider": "CACHE", "cached": True}
+
+    def cached_response(
+        self, messages: List[Dict[str, str]], max_tokens: int = 1024
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached reply from the current provider's model, or None.
+
+        Hits report provider "CACHE".
+        """
+        current = self.current_provider
+        if current is None or max_tokens > 1024:
+            return None
+        return self._cache_get(self._cache_key(messages, max_tokens, current.model))
+
+    def _cache_put(self, key: str, result: Dict[str, Any]):
+        self._cache[key] = (time.time(), result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+
+    async def _post_with_retry(
+        self,
+        provider: LLMProvider,
+        payload: Dict[str, Any],
+        retries: int = 3,
+        read_timeout: Optional[float] = None,
+    ) -> aiohttp.ClientResponse:
+        """POST a chat completion, retrying transient failures with backoff.
+
+        Connection errors, timeouts and RETRYABLE_STATUSES are retried up to
+        `retries` times in total. All attempts share one provider.timeout
+        deadline, so a hung provider costs at most that long before the
+        caller falls back. Any other status is returned straight away.
+
+        The deadline also covers reading the body unless `read_timeout` is
+        given; streams pass it so a long but steady generation isn't cut off,
+        and only a gap of `read_timeout` seconds between chunks fails it.
+        """
+        data = orjson.dumps(payload)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + provider.timeout
+        for attempt in range(retries):
+            if read_timeout is None:
+                timeout = aiohttp.ClientTimeout(total=deadline - loop.time())
+            else:
+                timeout = aiohttp.ClientTimeout(total=None, sock_read=read_timeout)
+            try:
+                resp = await asyncio.wait_for(
+                    self._session.post(
+                        f"{provider.api_base}/chat/completions",
+                        data=data,
+                        headers=provider._headers,
+                        timeout=timeout,
+                    ),
+                    deadline - loop.time(),
+                )
+                error = None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                resp, error = None, e
+            delay = min(0.2 * (2 ** attempt), 2.0) + random.random() * 0.1
+            last = attempt == retries - 1 or loop.time() + delay >= deadline
+            if error is not None:
+                if last:
+                    raise error
+            elif resp.status not in RETRYABLE_STATUSES or last:
+                return resp
+            else:
+                resp.release()
+            await asyncio.sleep(delay)
+
+    async def generate_stream(
+        self, messages: List[Dict[str, str]], max_tokens: int = 1024
+    ) -> AsyncIterator[str]:
+        """Stream a response from the current provider as content deltas.
+
+        Unlike generate() this does not fall back across providers or read
+        the response cache; callers should check cached_response() first and
+        fall back to generate() when it raises. On failure it switches away
+        from the provider, so that fallback doesn't retry the one that just
+        failed. Backends that ignore "stream" and answer with a plain JSON
+        body yield the whole reply once.
+        """
+        provider = self.current_provider
+        if provider is None:
+            raise RuntimeError("No LLM providers configured")
+
+        await self.startup()
+        state = provider.cb_state()
+        if state == "OPEN" or (state == "HALF_OPEN" and provider.cb_probing):
+            self.switch_away_from(provider)
+            raise RuntimeError(f"Circuit breaker open for {provider.name}")
+        payload = {
+            "model": provider.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": 0.7,
+            "stream": True,
+        }
+        parts: List[str] = []
+        # A HALF_OPEN provider gets this request as its single probe
+        probing = state == "HALF_OPEN"
+        if probing:
+            provider.cb_probing = True
+        try:
+            start = time.time()
+            # The concurrency slot only covers sending the request; holding it
+            # across the yields below would let slow consumers (Telegram
+            # edits, rate limiting) starve every other LLM call.
+            async with self._sem:
+                resp = await self._post_with_retry(
+                    provider, payload, read_timeout=provider.timeout
+                )
+            async with resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    raise Exception(f"HTTP {resp.status}: {body[:200]}")
+                if resp.content_type != "text/event-stream":
+                    result = orjson.loads(await resp.read())
+                    content = result["choices"][0]["message"]["content"]
+                    if content:
+                        parts.append(content)
+                        yield content
+                else:
+                    # SSE allows CRLF line endings; normalise before framing and
+                    # parse whatever is left once the server closes the stream
+                    pending = b""
+                    async for chunk in resp.content.iter_chunked(1024):
+                        pending = (pending + chunk).replace(b"\r\n", b"\n")
+                        *frames, pending = pending.split(b"\n\n")
+                        for frame in frames:
+                            delta = _parse_sse_frame(frame)
+                            if delta:
+                                parts.append(delta)
+                                yield delta
+                    try:
+                        delta = _parse_sse_frame(pending)
+                    except ValueError:  # frame cut off mid-JSON
+                        delta = None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            if not parts:
+                raise Exception("Empty streamed response")
+        except Exception as e:
+            provider.healthy = False
+            provider.last_error = str(e)
+            provider.record_failure()
+            _log_provider_error(provider, f"Streaming failed with {provider.name}: {e}")
+            self.switch_away_from(provider)
+            raise
+        finally:
+            # Also covers cancellation and abandoned streams
+            if probing:
+                provider.cb_probing = False
+
+        provider.latency_ms = (time.time() - start) * 1000
+        provider.healthy = True
+        provider.record_success()
+        if max_tokens <= 1024:
+            self._cache_put(
+                self._cache_key(messages, max_tokens, provider.model),
+                {
+                    "success": True,
+                    "provider": provider.name,
+                    "model": provider.model,
+                    "content": "".join(parts),
+                    "latency_ms": provider.latency_ms,
+                },
+            )
+
+    async def generate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 1024,
+        use_cache: bool = True,
+    ) -> Dict[str, Any]:
+        """Generate response with automatic fallback across providers.
+
+        Successful responses are kept in a small in-memory LRU; pass
+        use_cache=False to always hit the provider.
+        """
+        if not self.providers:
+            return {"success": False, "error": "No LLM providers configured", "provider": "NONE"}
+
+        cacheable = use_cache and max_tokens <= 1024
+        if cacheable:
+            cached = self.cached_response(messages, max_tokens)
+            if cached is not None:
+                return cached
+
+        await self.startup()
+        attempts = 0
+        max_attempts = len(self.providers)
+
+        while attempts < max_attempts:
+            provider = self.current_provider
+
+            state = provider.cb_state()
+            if state == "OPEN" or (state == "HALF_OPEN" and provider.cb_probing):
+                if attempts < max_attempts - 1:
+                    self.switch_away_from(provider)
+                attempts += 1
+                continue
+            probing = state == "HALF_OPEN"
+            if probing:
+                provider.cb_probing = True
+
+            try:
+                start = time.time()
+                payload = {
+                    "model": provider.model,
+                    "messages": messages,
+                    "max_tokens": max_tokens,
+                    "temperature": 0.7,
+                }
+                async with (
+                    self._sem,
+                    await self._post_with_retry(provider, payload) as resp,
+                ):
+                    if resp.status == 200:
+                        provider.latency_ms = (time.time() - start) * 1000
+                        provider.healthy = True
+                        provider.record_success()
+                        result = orjson.loads(await resp.read())
+                        response = {
+                            "success": True,
+                            "provider": provider.name,
+                            "model": provider.model,
+                            "content": result["choices"][0]["message"]["content"],
+                            "latency_ms": provider.latency_ms,
+                        }
+                        if cacheable and response["content"]:
+                            self._cache_put(
+                                self._cache_key(messages, max_tokens, provider.model),
+                                response,
+                            )
+                        return response
+                    else:
+                        body = await resp.text()
+                        raise Exception(f"HTTP {resp.status}: {body[:200]}")
+
+            except Exception as e:
+                provider.healthy = False
+                provider.last_error = str(e)
+                provider.record_failure()
+                _log_provider_error(
+                    provider, f"Generation failed with {provider.name}: {e}"
+                )
+
+                if attempts < max_attempts - 1:
+                    self.switch_away_from(provider)
+
+                attempts += 1
+            finally:
+                # Cancellation skips record_success/record_failure
+                if probing:
+                    provider.cb_probing = False
+
+        return {
+            "success": False,
+            "error": "All providers failed",
+            "provider": "NONE",
+        }
+
+
+# =============================================================================
+# REPLY STREAMING
+# =============================================================================
+
+# Minimum seconds between streaming edits; Telegram allows ~1 edit/sec per chat.
+STREAM_EDIT_INTERVAL = 1.0
+
+
+async def send_typing(bot: Any, chat_id: int):
+    """Send a typing chat action, ignoring failures."""
+    try:
+        await bot.send_chat_action(chat_id=chat_id, action="typing")
+    except Exception:
+        pass
+
+
+async def stream_response(
+    llm_mgr: LLMManager,
+    messages: List[Dict[str, str]],
+    edit: Callable[[str], Awaitable[Any]],
+) -> Dict[str, Any]:
+    """Stream a reply through `edit`; returns a generate()-style result.
+
+    `edit` receives the text so far at most once per STREAM_EDIT_INTERVAL and
+    its failures are ignored. If streaming fails the reply comes from
+    llm_mgr.generate() instead, unless no other provider is left to try. The result's "shown" key holds the last text
+    `edit` accepted (or None), so callers can skip a final edit that Telegram
+    would reject as "message is not modified".
+    """
+    provider = llm_mgr.current_provider
+    parts: List[str] = []
+    shown: Optional[str] = None
+    try:
+        last_edit = time.monotonic()
+        # aclosing() releases the connection at once if we stop early
+        async with aclosing(llm_mgr.generate_stream(messages)) as stream:
+            async for delta in stream:
+                parts.append(delta)
+                if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                    text = "".join(parts)
+                    try:
+                        await edit(text)
+                        shown = text
+                    except Exception:
+                        pass
+                    last_edit = time.monotonic()
+        result = {"success": True, "provider": provider.name, "content": "".join(parts)}
+    except Exception as e:
+        if llm_mgr.current_provider is provider:
+            # Nothing to fall back to (e.g. LOCAL only); generate() would just
+            # wait out the same provider's timeout again
+            result = {"success": False, "error": str(e), "provider": "NONE"}
+        else:
+            result = await llm_mgr.generate(messages)
+    return {**result, "shown": shown}
+
+
+# =============================================================================
+# BOT STATE
+# =============================================================================
+
+
+class BotState:
+    """Runtime counters and shared objects.
+
+    Counters are driven by itertools.count, whose next() is a single C call
+    and therefore safe even if a handler is ever moved onto a thread.
+    """
+
+    def __init__(self):
+        self._mono_start = time.monotonic()
+        self._uptime_cache = (-1, "")
+        self._msg_counter = itertools.count(1)
+        self._err_counter = itertools.count(1)
+        self._message_count = 0
+        self._error_count = 0
+        self.llm_manager: Optional[LLMManager] = None
+
+    @property
+    def message_count(self) -> int:
+        return self._message_count
+
+    @property
+    def error_count(self) -> int:
+        return self._error_count
+
+    def record_message(self):
+        self._message_count = next(self._msg_counter)
+
+    def record_error(self):
+        self._error_count = next(self._err_counter)
+
+    @property
+    def uptime(self) -> str:
+        s = int(time.monotonic() - self._mono_start)
+        if s != self._uptime_cache[0]:
+            self._uptime_cache = (s, f"{s // 3600}h {(s % 3600) // 60}m {s % 60}s")
+        return self._uptime_cache[1]
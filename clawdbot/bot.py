@@ -8,23 +8,25 @@ LLM: Remote (User's local machine via secure tunnel)
 
 import os
 import sys
-import json
-import time
 import logging
 import asyncio
-import aiohttp
-from datetime import datetime
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass, field
+from typing import Final
 
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import (
     Application,
+    ApplicationHandlerStop,
     CommandHandler,
+    Defaults,
     MessageHandler,
+    TypeHandler,
     ContextTypes,
     filters
 )
+from telegram.request import HTTPXRequest
+
+from _core import Config, LLMManager, BotState, send_typing, stream_response
 
 # Configure logging
 logging.basicConfig(
@@ -33,217 +35,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# =============================================================================
-# CONFIGURATION
-# =============================================================================
-
-@dataclass
-class Config:
-    """Bot configuration from environment variables"""
-    # Telegram
-    TELEGRAM_BOT_TOKEN: str = field(default_factory=lambda: os.getenv("TELEGRAM_BOT_TOKEN", ""))
-    TELEGRAM_ALLOWED_IDS: List[str] = field(default_factory=lambda: os.getenv("TELEGRAM_ALLOWED_IDS", "").split(","))
-    
-    # Local LLM (Remote - User's machine)
-    LOCAL_LLM_API_BASE: str = field(default_factory=lambda: os.getenv("LOCAL_LLM_API_BASE", ""))
-    LOCAL_LLM_MODEL: str = field(default_factory=lambda: os.getenv("LOCAL_LLM_MODEL", ""))
-    LOCAL_LLM_TIMEOUT: int = field(default_factory=lambda: int(os.getenv("LOCAL_LLM_TIMEOUT", "60")))
-    
-    # Fallback APIs
-    OPENAI_API_KEY: Optional[str] = field(default_factory=lambda: os.getenv("OPENAI_API_KEY"))
-    ANTHROPIC_API_KEY: Optional[str] = field(default_factory=lambda: os.getenv("ANTHROPIC_API_KEY"))
-    
-    def validate(self) -> bool:
-        """Validate required configuration"""
-        if not self.TELEGRAM_BOT_TOKEN:
-            logger.error("TELEGRAM_BOT_TOKEN not set")
-            return False
-        if not self.TELEGRAM_ALLOWED_IDS or self.TELEGRAM_ALLOWED_IDS == ['']:
-            logger.error("TELEGRAM_ALLOWED_IDS not set")
-            return False
-        if not self.LOCAL_LLM_API_BASE:
-            logger.error("LOCAL_LLM_API_BASE not set")
-            return False
-        return True
+# Global state
+bot_state = BotState()
 
 # =============================================================================
-# LLM PROVIDER MANAGEMENT
+# MESSAGE TEMPLATES
 # =============================================================================
 
-@dataclass
-class LLMProvider:
-    """LLM provider configuration"""
-    name: str
-    api_base: str
-    model: str
-    api_key: Optional[str] = None
-    timeout: int = 60
-    healthy: bool = True
-    last_error: Optional[str] = None
-    latency_ms: float = 0.0
-
-class LLMManager:
-    """Manages LLM providers with automatic fallback"""
-    
-    def __init__(self, config: Config):
-        self.config = config
-        self.providers: List[LLMProvider] = []
-        self.current_provider_index = 0
-        self._setup_providers()
-    
-    def _setup_providers(self):
-        """Initialize provider priority list"""
-        # Priority 1: Local LLM (User's machine)
-        self.providers.append(LLMProvider(
-            name="LOCAL",
-            api_base=self.config.LOCAL_LLM_API_BASE,
-            model=self.config.LOCAL_LLM_MODEL,
-            timeout=self.config.LOCAL_LLM_TIMEOUT
-        ))
-        
-        # Priority 2: OpenAI
-        if self.config.OPENAI_API_KEY:
-            self.providers.append(LLMProvider(
-                name="OPENAI",
-                api_base="https://api.openai.com/v1",
-                model="gpt-4o-mini",
-                api_key=self.config.OPENAI_API_KEY,
-                timeout=30
-            ))
-        
-        logger.info(f"Initialized {len(self.providers)} LLM providers")
-    
-    @property
-    def current_provider(self) -> LLMProvider:
-        """Get current active provider"""
-        return self.providers[self.current_provider_index]
-    
-    def switch_to_next_provider(self):
-        """Switch to next available provider"""
-        old_provider = self.current_provider.name
-        self.current_provider_index = (self.current_provider_index + 1) % len(self.providers)
-        new_provider = self.current_provider.name
-        logger.warning(f"Switched LLM provider: {old_provider} -> {new_provider}")
-        return old_provider, new_provider
-    
-    async def health_check(self, provider: Optional[LLMProvider] = None) -> bool:
-        """Check if a provider is healthy"""
-        prov = provider or self.current_provider
-        
-        try:
-            start = time.time()
-            async with aiohttp.ClientSession() as session:
-                # Test with minimal prompt
-                payload = {
-                    "model": prov.model,
-                    "messages": [{"role": "user", "content": "Reply with OK."}],
-                    "max_tokens": 10,
-                    "temperature": 0.1
-                }
-                
-                headers = {"Content-Type": "application/json"}
-                if prov.api_key:
-                    headers["Authorization"] = f"Bearer {prov.api_key}"
-                
-                async with session.post(
-                    f"{prov.api_base}/chat/completions",
-                    json=payload,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=prov.timeout)
-                ) as resp:
-                    prov.latency_ms = (time.time() - start) * 1000
-                    prov.healthy = resp.status == 200
-                    if not prov.healthy:
-                        prov.last_error = f"HTTP {resp.status}"
-                    return prov.healthy
-        except Exception as e:
-            prov.healthy = False
-            prov.last_error = str(e)
-            logger.warning(f"Health check failed for {prov.name}: {e}")
-            return False
-    
-    async def generate(self, messages: List[Dict[str, str]], max_tokens: int = 1024) -> Dict[str, Any]:
-        """Generate response with automatic fallback"""
-        attempts = 0
-        max_attempts = len(self.providers)
-        
-        while attempts < max_attempts:
-            provider = self.current_provider
-            
-            try:
-                start = time.time()
-                async with aiohttp.ClientSession() as session:
-                    payload = {
-                        "model": provider.model,
-                        "messages": messages,
-                        "max_tokens": max_tokens,
-                        "temperature": 0.7
-                    }
-                    
-                    headers = {"Content-Type": "application/json"}
-                    if provider.api_key:
-                        headers["Authorization"] = f"Bearer {provider.api_key}"
-                    
-                    async with session.post(
-                        f"{provider.api_base}/chat/completions",
-                        json=payload,
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(total=provider.timeout)
-                    ) as resp:
-                        if resp.status == 200:
-                            provider.latency_ms = (time.time() - start) * 1000
-                            provider.healthy = True
-                            result = await resp.json()
-                            return {
-                                "success": True,
-                                "provider": provider.name,
-                                "model": provider.model,
-                                "content": result["choices"][0]["message"]["content"],
-                                "latency_ms": provider.latency_ms
-                            }
-                        else:
-                            raise Exception(f"HTTP {resp.status}")
-                            
-            except Exception as e:
-                provider.healthy = False
-                provider.last_error = str(e)
-                logger.warning(f"Generation failed with {provider.name}: {e}")
-                
-                # Try next provider
-                if attempts < max_attempts - 1:
-                    old, new = self.switch_to_next_provider()
-                    logger.info(f"Falling back: {old} -> {new}")
-                
-                attempts += 1
-        
-        return {
-            "success": False,
-            "error": "All providers failed",
-            "provider": "NONE"
-        }
-
-# =============================================================================
-# BOT STATE
-# =============================================================================
+SEPARATOR: Final = "━━━━━━━━━━━━━━━━━━━━━"
 
-class BotState:
-    """Bot runtime state"""
-    def __init__(self):
-        self.start_time = datetime.now()
-        self.message_count = 0
-        self.error_count = 0
-        self.llm_manager: Optional[LLMManager] = None
-    
-    @property
-    def uptime(self) -> str:
-        """Get formatted uptime"""
-        delta = datetime.now() - self.start_time
-        hours, remainder = divmod(int(delta.total_seconds()), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        return f"{hours}h {minutes}m {seconds}s"
+START_MSG: Final = (
+    "🤖 *ClawDBot* - AI Assistant\n"
+    f"{SEPARATOR}\n"
+    "Send me any message and I'll respond using AI.\n\n"
+    "📋 *Commands:*\n"
+    "/status - Bot status\n"
+    "/health - LLM health check\n"
+    "/model - Active model info\n"
+    "/restart - Restart bot\n"
+    "/shutdown - Shutdown bot"
+)
 
-# Global state
-bot_state = BotState()
+STATUS_HEADER: Final = f"📊 *Bot Status*\n{SEPARATOR}\n🟢 State: Running\n"
+HEALTH_HEADER: Final = f"🩺 *LLM Health Report*\n{SEPARATOR}"
+MODEL_HEADER: Final = f"🧠 *Active Model Information*\n{SEPARATOR}\n"
 
 # =============================================================================
 # TELEGRAM COMMAND HANDLERS
@@ -251,42 +66,32 @@ bot_state = BotState()
 
 def is_authorized(user_id: int, config: Config) -> bool:
     """Check if user is authorized"""
-    return str(user_id) in config.TELEGRAM_ALLOWED_IDS
+    return user_id in config.TELEGRAM_ALLOWED_IDS
+
+async def auth_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Reject updates from unauthorized users before any other handler runs"""
+    user = update.effective_user
+    if user is not None and is_authorized(user.id, context.bot_data["config"]):
+        return
+    # Only answer text; other messages (media, group joins, pins) are dropped silently
+    if update.message and update.message.text:
+        await update.message.reply_text("⛔ Unauthorized access.")
+    raise ApplicationHandlerStop
+
+def safe_truncate(s: str, n: int) -> str:
+    """Truncate `s` for embedding in a Markdown message, dropping entity characters"""
+    return s[:n].replace("`", "").replace("*", "").replace("_", "")
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
-    await update.message.reply_text(
-        "🤖 *ClawDBot* - AI Assistant\n"
-        "━━━━━━━━━━━━━━━━━━━━━\n"
-        "Send me any message and I'll respond using AI.\n\n"
-        "📋 *Commands:*\n"
-        "/status - Bot status\n"
-        "/health - LLM health check\n"
-        "/model - Active model info\n"
-        "/restart - Restart bot\n"
-        "/shutdown - Shutdown bot",
-        parse_mode="Markdown"
-    )
+    await update.message.reply_text(START_MSG)
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /status command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
     llm_mgr = bot_state.llm_manager
     current = llm_mgr.current_provider if llm_mgr else None
     
-    status_text = (
-        "📊 *Bot Status*\n"
-        "━━━━━━━━━━━━━━━━━━━━━\n"
-        f"🟢 State: Running\n"
+    status_text = STATUS_HEADER + (
         f"⏱️ Uptime: {bot_state.uptime}\n"
         f"💬 Messages: {bot_state.message_count}\n"
         f"⚠️ Errors: {bot_state.error_count}\n"
@@ -294,27 +99,27 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"📦 Model: `{current.model if current else 'N/A'}`"
     )
     
-    await update.message.reply_text(status_text, parse_mode="Markdown")
+    await update.message.reply_text(status_text)
 
 async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /health command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
     llm_mgr = bot_state.llm_manager
     if not llm_mgr:
         await update.message.reply_text("❌ LLM Manager not initialized")
         return
     
     # Check all providers
-    await update.message.reply_text("🔍 Running health checks...")
+    placeholder = await update.message.reply_text("🔍 Running health checks...")
     
-    health_report = ["🩺 *LLM Health Report*\n━━━━━━━━━━━━━━━━━━━━━"]
+    results = await asyncio.gather(
+        *(llm_mgr.health_check(p) for p in llm_mgr.providers),
+        return_exceptions=True
+    )
+    
+    health_report = [HEALTH_HEADER]
     
-    for provider in llm_mgr.providers:
-        is_healthy = await llm_mgr.health_check(provider)
+    for provider, result in zip(llm_mgr.providers, results):
+        is_healthy = result is True
         status = "🟢 Healthy" if is_healthy else "🔴 Unhealthy"
         latency = f"{provider.latency_ms:.0f}ms" if provider.latency_ms > 0 else "N/A"
         
@@ -325,28 +130,20 @@ async def health_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Latency: {latency}"
         )
         if provider.last_error and not is_healthy:
-            health_report.append(f"Error: `{provider.last_error[:50]}...`")
+            health_report.append(f"Error: `{safe_truncate(provider.last_error, 50)}...`")
     
-    await update.message.reply_text("\n".join(health_report), parse_mode="Markdown")
+    await placeholder.edit_text("\n".join(health_report))
 
 async def model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /model command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
+    config = context.bot_data["config"]
     llm_mgr = bot_state.llm_manager
-    if not llm_mgr:
-        await update.message.reply_text("❌ LLM Manager not initialized")
+    if not llm_mgr or not llm_mgr.current_provider:
+        await update.message.reply_text("❌ No LLM providers configured")
         return
     
     current = llm_mgr.current_provider
-    tunnel_type = "Cloudflare" if "trycloudflare" in config.LOCAL_LLM_API_BASE else "Unknown"
-    
-    model_info = (
-        "🧠 *Active Model Information*\n"
-        "━━━━━━━━━━━━━━━━━━━━━\n"
+    model_info = MODEL_HEADER + (
         f"*Source:* {current.name}\n"
         f"*Model:* `{current.model}`\n"
         f"*Endpoint:* `{current.api_base[:40]}...`\n"
@@ -356,76 +153,80 @@ async def model_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if current.name == "LOCAL":
         model_info += (
-            f"\n*Tunnel:* {tunnel_type}\n"
+            f"\n*Tunnel:* {config.tunnel_type.name.title()}\n"
             f"*Hardware:* User Local Machine (≥32GB RAM)\n"
         )
     
     # List fallbacks
-    fallbacks = [p.name for p in llm_mgr.providers if p.name != current.name]
-    model_info += f"\n*Fallbacks:* {', '.join(fallbacks) if fallbacks else 'None'}"
+    fallbacks = ", ".join(llm_mgr.fallbacks_of(current.name)) or "None"
+    model_info += f"\n*Fallbacks:* {fallbacks}"
     
-    await update.message.reply_text(model_info, parse_mode="Markdown")
+    await update.message.reply_text(model_info)
 
 async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /restart command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
     await update.message.reply_text("🔄 Restarting ClawDBot...")
     logger.info("Restart requested via Telegram")
     
-    # Graceful shutdown and restart
-    asyncio.get_event_loop().call_later(2, lambda: os._exit(0))
+    # Let run_polling unwind (updater, post_shutdown), then re-exec in main()
+    context.application.bot_data["restart"] = True
+    asyncio.get_running_loop().call_later(2, context.application.stop_running)
 
 async def shutdown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /shutdown command"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
-        return
-    
     await update.message.reply_text("🛑 Shutting down ClawDBot...")
     logger.info("Shutdown requested via Telegram")
     
-    # Graceful shutdown
-    asyncio.get_event_loop().call_later(2, lambda: sys.exit(0))
+    # Graceful shutdown: run_polling stops the updater and runs post_shutdown
+    asyncio.get_running_loop().call_later(2, context.application.stop_running)
 
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle incoming messages"""
-    config = context.bot_data.get("config")
-    if not is_authorized(update.effective_user.id, config):
-        await update.message.reply_text("⛔ Unauthorized access.")
+    # Authorization is handled by auth_gate; edited messages arrive with
+    # update.message unset and are ignored
+    if update.message is None or not update.message.text:
         return
-    
     user_message = update.message.text
-    bot_state.message_count += 1
+    bot_state.record_message()
     
     llm_mgr = bot_state.llm_manager
     if not llm_mgr:
         await update.message.reply_text("❌ LLM Manager not initialized")
         return
     
-    # Show typing indicator
-    await context.bot.send_chat_action(
-        chat_id=update.effective_chat.id,
-        action="typing"
-    )
-    
-    # Generate response
+    # Answer cache hits with a single reply, otherwise stream into a
+    # placeholder message (falling back to a regular request if that fails)
     messages = [{"role": "user", "content": user_message}]
-    result = await llm_mgr.generate(messages)
+    result = llm_mgr.cached_response(messages)
+    send = update.message.reply_text
+    if result is None:
+        # Show typing indicator while the response is generated
+        context.application.create_task(
+            send_typing(context.bot, update.effective_chat.id), update=update
+        )
+        msg = await update.message.reply_text("…")
+        send = msg.edit_text
+        # Partial output may contain unbalanced Markdown, so stream it as plain text
+        result = await stream_response(
+            llm_mgr, messages, lambda text: msg.edit_text(text, parse_mode=None)
+        )
     
     if result["success"]:
-        response = result["content"]
         # Add provider indicator for transparency
-        if result["provider"] != "LOCAL":
-            response += f"\n\n_(via {result['provider']})_"
-        await update.message.reply_text(response, parse_mode="Markdown")
+        response = (
+            result["content"] if result["provider"] == "LOCAL"
+            else f"{result['content']}\n\n_(via {result['provider']})_"
+        )
+        # Fall back to plain text unless streaming already left exactly this
+        # text in place (Telegram rejects that as "message is not modified")
+        try:
+            await send(response)
+        except Exception:
+            if response != result.get("shown"):
+                await send(response, parse_mode=None)
     else:
-        bot_state.error_count += 1
-        await update.message.reply_text(
+        bot_state.record_error()
+        await send(
             "❌ Failed to generate response. All LLM providers unavailable.\n"
             "Check /health for details."
         )
@@ -440,19 +241,42 @@ async def post_init(application: Application):
     
     # Initialize LLM Manager
     bot_state.llm_manager = LLMManager(config)
+    await bot_state.llm_manager.startup()
     
-    # Initial health check
-    logger.info("Running initial LLM health check...")
-    healthy = await bot_state.llm_manager.health_check()
+    # Initial health check of all providers at once; the first healthy one
+    # becomes the active provider
+    logger.info("Running initial LLM health checks...")
+    llm_mgr = bot_state.llm_manager
+    results = await llm_mgr.probe_all()
     
-    if healthy:
-        logger.info(f"✅ Local LLM healthy: {bot_state.llm_manager.current_provider.model}")
+    for provider, healthy in zip(llm_mgr.providers, results):
+        logger.info(
+            "%s %-8s %-10s %6.0fms",
+            "✅" if healthy else "⚠️", provider.name,
+            "healthy" if healthy else "unhealthy", provider.latency_ms
+        )
+    if any(results):
+        current = llm_mgr.current_provider
+        logger.info("Active LLM: %s (%s)", current.name, current.model)
     else:
-        logger.warning("⚠️ Local LLM unhealthy, will use fallbacks")
-        bot_state.llm_manager.switch_to_next_provider()
+        logger.warning("⚠️ No healthy LLM providers, will retry on first message")
+    
+    # Keep re-probing providers in the background
+    if config.LLM_PROBE_INTERVAL > 0 and llm_mgr.providers:
+        application.bot_data["probe_task"] = asyncio.create_task(
+            llm_mgr.periodic_probe(config.LLM_PROBE_INTERVAL)
+        )
     
     logger.info("ClawDBot initialized and ready")
 
+async def post_shutdown(application: Application):
+    """Stop background work and release the LLM connection pool"""
+    probe_task = application.bot_data.get("probe_task")
+    if probe_task is not None:
+        probe_task.cancel()
+    if bot_state.llm_manager is not None:
+        await bot_state.llm_manager.close()
+
 def main():
     """Main entry point"""
     # Load configuration
@@ -462,25 +286,59 @@ def main():
         sys.exit(1)
     
     logger.info("Starting ClawDBot...")
-    logger.info(f"Allowed users: {config.TELEGRAM_ALLOWED_IDS}")
-    logger.info(f"Local LLM: {config.LOCAL_LLM_MODEL}")
+    logger.info("Allowed users: %s", config.TELEGRAM_ALLOWED_IDS)
+    logger.info("Local LLM: %s", config.LOCAL_LLM_MODEL)
     
     # Build application
-    application = Application.builder().token(config.TELEGRAM_BOT_TOKEN).build()
+    # All bot replies are Markdown unless a call site opts out with parse_mode=None.
+    # Separate connection pools for replies and long polling, and concurrent
+    # update processing so one slow LLM call doesn't block every other chat.
+    application = (
+        Application.builder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        .defaults(Defaults(parse_mode=ParseMode.MARKDOWN))
+        .request(
+            HTTPXRequest(
+                connection_pool_size=64,
+                pool_timeout=10.0,
+                connect_timeout=5.0,
+                read_timeout=20.0,
+            )
+        )
+        .get_updates_request(
+            HTTPXRequest(
+                connection_pool_size=8,
+                pool_timeout=30.0,
+                read_timeout=35.0,
+            )
+        )
+        .concurrent_updates(True)
+        .build()
+    )
     application.bot_data["config"] = config
     
-    # Register handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("status", status_command))
-    application.add_handler(CommandHandler("health", health_command))
-    application.add_handler(CommandHandler("model", model_command))
-    application.add_handler(CommandHandler("restart", restart_command))
-    application.add_handler(CommandHandler("shutdown", shutdown_command))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+    # Register handlers (auth gate first, in its own group; it must block so
+    # it can stop unauthorized updates). block=False lets the rest run side by side.
+    application.add_handler(TypeHandler(Update, auth_gate), group=-1)
+    application.add_handler(CommandHandler("start", start_command, block=False))
+    application.add_handler(CommandHandler("status", status_command, block=False))
+    application.add_handler(CommandHandler("health", health_command, block=False))
+    application.add_handler(CommandHandler("model", model_command, block=False))
+    application.add_handler(CommandHandler("restart", restart_command, block=False))
+    application.add_handler(CommandHandler("shutdown", shutdown_command, block=False))
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler, block=False)
+    )
     
-    # Run with post-init
+    # Run with post-init / post-shutdown hooks
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
     application.run_polling(allowed_updates=Update.ALL_TYPES)
+    
+    # Replace the process in place once everything has been shut down cleanly
+    if application.bot_data.get("restart"):
+        logger.info("Restarting ClawDBot...")
+        os.execv(sys.executable, [sys.executable] + sys.argv)
 
 if __name__ == "__main__":
     main()
@@ -96,7 +96,7 @@ deploy_app() {
     sudo mkdir -p "$DEPLOY_DIR"
     
     # Copy files
-    sudo cp docker-compose.yml Dockerfile bot.py requirements.txt "$DEPLOY_DIR/"
+    sudo cp docker-compose.yml Dockerfile bot.py _core.py requirements.txt "$DEPLOY_DIR/"
     
     # Create .env file
     sudo tee "$DEPLOY_DIR/.env" > /dev/null <<EOF